@@ -1,8 +1,276 @@
 import streamlit as st
 import json
+import orjson
+import ijson
+import numpy as np
 import pandas as pd
-from io import BytesIO
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import xlsxwriter
+from io import BytesIO, StringIO
+from itertools import islice
+import csv
 import datetime
+import re
+
+# Uploads larger than this are streamed with ijson instead of parsed in one go
+STREAM_THRESHOLD = 50 * 1024 * 1024
+# Chunk size ijson reads at a time when streaming
+READ_BUFFER_SIZE = 1 << 20
+# Number of records sampled for key discovery
+KEY_SAMPLE_SIZE = 10_000
+# Tables longer than this get unique counts of text columns estimated from a sample
+NUNIQUE_SAMPLE_SIZE = 100_000
+# Byte order mark some editors put at the start of UTF-8 files
+UTF8_BOM = b'\xef\xbb\xbf'
+# Rows (header included) and columns per Excel worksheet
+EXCEL_MAX_ROWS = 1_048_576
+EXCEL_MAX_COLS = 16_384
+# Rows converted to Python values at a time while writing Excel sheets
+EXCEL_WRITE_BLOCK_SIZE = 10_000
+# Cached results kept per helper; each entry can hold a whole file's worth of data
+CACHE_MAX_ENTRIES = 4
+# Display names of the types JSON values parse to
+_TNAME = {int: 'int', str: 'str', float: 'float', bool: 'bool', dict: 'dict', list: 'list', type(None): 'NoneType'}
+
+
+def iter_records(file_obj, prefix):
+    """Stream the records found under prefix ('data.item' or 'item').
+
+    Reading starts at the current position of file_obj. ijson's C backend
+    fails with "integer overflow" on integers of 2**63 and above, which the
+    pure-Python backend parses exactly, so on that error only the file is
+    read again with the Python backend, skipping the records already yielded.
+    Other parse errors propagate straight away.
+    """
+    start = file_obj.tell()
+    yielded = 0
+    try:
+        for item in ijson.items(file_obj, prefix, use_float=True, buf_size=READ_BUFFER_SIZE):
+            yielded += 1
+            yield item
+        return
+    except ijson.JSONError as e:
+        if 'integer overflow' not in str(e):
+            raise
+        file_obj.seek(start)
+    python_backend = ijson.get_backend('python')
+    records = python_backend.items(file_obj, prefix, use_float=True, buf_size=READ_BUFFER_SIZE)
+    yield from islice(records, yielded, None)
+
+
+# The cached helpers below are keyed on file_key, which identifies the upload;
+# the underscored arguments carry the data and are not hashed.
+@st.cache_resource(show_spinner=False, max_entries=CACHE_MAX_ENTRIES)
+def load_json(file_key: str, _file_bytes: bytes):
+    """Parse the upload once per file; the tree is shared read-only across reruns.
+
+    orjson turns integers outside the 64-bit range into floats, so documents
+    with 19+ digit numbers go through the stdlib parser, which keeps them
+    exact, as do documents orjson rejects.
+    """
+    # Editors such as Notepad save UTF-8 with a byte order mark, which orjson rejects
+    file_bytes = _file_bytes.removeprefix(UTF8_BOM)
+    if not re.search(rb'\d{19}', file_bytes):
+        try:
+            return orjson.loads(file_bytes)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(file_bytes)
+
+
+def json_start(file_bytes: bytes) -> int:
+    """Return the offset of the first JSON token, past any byte order mark and whitespace."""
+    start = len(UTF8_BOM) if file_bytes.startswith(UTF8_BOM) else 0
+    return re.compile(rb'\s*').match(file_bytes, start).end()
+
+
+def get_records(file_key: str, file_bytes: bytes):
+    """Return the records to extract, streamed from the bytes for large files."""
+    if len(file_bytes) > STREAM_THRESHOLD:
+        # A root array holds the records itself; otherwise look under 'data'
+        start = json_start(file_bytes)
+        prefix = 'item' if file_bytes[start:start + 1] == b'[' else 'data.item'
+        file_obj = BytesIO(file_bytes)
+        file_obj.seek(start)
+        return iter_records(file_obj, prefix)
+    json_data = load_json(file_key, file_bytes)
+    return json_data if isinstance(json_data, list) else json_data.get("data", [])
+
+
+@st.cache_data(show_spinner=False, max_entries=CACHE_MAX_ENTRIES)
+def peek_records(file_key: str, _file_bytes: bytes) -> list:
+    """Return the first record, if any, without reading the rest of the file."""
+    return list(islice(get_records(file_key, _file_bytes), 1))
+
+
+@st.cache_data(show_spinner=False, max_entries=CACHE_MAX_ENTRIES)
+def extract_keys_info(file_key: str, _file_bytes: bytes) -> dict:
+    """Collect the keys of the sampled records along with the type names seen for each."""
+    sample = [item for item in islice(get_records(file_key, _file_bytes), KEY_SAMPLE_SIZE) if isinstance(item, dict)]
+    # dtype=object keeps the original Python values
+    probe = pd.DataFrame(sample, dtype=object)
+    keys_info = {}
+    for key in probe.columns:
+        values = probe[key]
+        # Keys absent from a record come through as NaN (JSON itself has no
+        # NaN), while an explicit JSON null stays None
+        present = values[values.notna() | np.equal(values.to_numpy(), None)]
+        keys_info[key] = frozenset(_TNAME.get(t) or t.__name__ for t in present.map(type).unique())
+    return keys_info
+
+
+@st.cache_data(show_spinner=False, max_entries=CACHE_MAX_ENTRIES)
+def key_options(file_key: str, _file_bytes: bytes):
+    """Return the sorted keys and their picker labels (key plus type names)."""
+    keys_info = extract_keys_info(file_key, _file_bytes)
+    labels = {key: f"{key} ({', '.join(sorted(types))})" for key, types in keys_info.items()}
+    return sorted(labels), labels
+
+
+@st.cache_data(show_spinner=False, max_entries=CACHE_MAX_ENTRIES)
+def build_df(file_key: str, _file_bytes: bytes, selected_keys: tuple) -> pd.DataFrame:
+    """Build the DataFrame column-wise (one list per key) for the selected keys."""
+    df_cols = {key: [] for key in selected_keys}
+    for item in get_records(file_key, _file_bytes):
+        if isinstance(item, dict):
+            for key in selected_keys:
+                value = item.get(key)
+                # Handle nested dictionaries or lists
+                if isinstance(value, (dict, list)):
+                    value = orjson.dumps(value).decode()
+                df_cols[key].append(value)
+    return shrink_dtypes(pd.DataFrame(df_cols, copy=False))
+
+
+def shrink_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """Narrow integer columns and turn repetitive text columns into categoricals.
+
+    Floats are left as float64: downcasting to float32 would change the
+    exported values. Only columns holding nothing but strings are
+    categorized, since categories merge values that compare equal (True
+    and 1). Repetitiveness is judged on the same fixed sample count_unique
+    uses, so the full column is not hashed here.
+    """
+    for col in df.select_dtypes('integer').columns:
+        df[col] = pd.to_numeric(df[col], downcast='integer')
+    for col in df.select_dtypes(include=['object', 'string']).columns:
+        values = df[col]
+        if pd.api.types.infer_dtype(values, skipna=True) != 'string':
+            continue
+        if len(values) > NUNIQUE_SAMPLE_SIZE:
+            values = values.sample(NUNIQUE_SAMPLE_SIZE, random_state=0)
+        if values.nunique() < len(values) * 0.5:
+            df[col] = df[col].astype('category')
+    return df
+
+
+def count_unique(df: pd.DataFrame):
+    """Count distinct values per column, estimating text columns of large tables.
+
+    Hashing every Python string dominates on long object columns, so those are
+    counted on a fixed sample. Columns that are (nearly) all distinct in the
+    sample, such as IDs, are scaled up to the full length; the rest use the
+    GEE estimator, which scales only the values seen once in the sample.
+    Returns the counts and whether any of them are estimates.
+    """
+    object_cols = df.select_dtypes(include=['object', 'string']).columns
+    if len(df) <= NUNIQUE_SAMPLE_SIZE or not len(object_cols):
+        return df.nunique(), False
+    counts = df.drop(columns=object_cols).nunique()
+    sample = df[object_cols].sample(NUNIQUE_SAMPLE_SIZE, random_state=0)
+    estimates = {}
+    for col in object_cols:
+        freq = sample[col].value_counts()
+        sampled, total = freq.sum(), df[col].count()
+        if not sampled:
+            estimates[col] = 0
+            continue
+        once = int((freq == 1).sum())
+        if len(freq) >= sampled * 0.95:
+            estimate = len(freq) * total / sampled
+        else:
+            estimate = once * (total / sampled) ** 0.5 + (len(freq) - once)
+        estimates[col] = int(round(min(estimate, total)))
+    return pd.concat([counts, pd.Series(estimates, dtype=int)])[df.columns], True
+
+
+def to_excel(sheets: dict) -> bytes:
+    """Write each (sheet name, DataFrame) pair to an in-memory workbook.
+
+    constant_memory mode flushes every row as soon as the next one starts, so
+    rows are written in order here rather than through DataFrame.to_excel,
+    which fills the sheet column by column.
+    """
+    # write_row silently ignores cells past Excel's limits, so refuse up front
+    # like DataFrame.to_excel did
+    for sheet_name, sheet_df in sheets.items():
+        if len(sheet_df) + 1 > EXCEL_MAX_ROWS or len(sheet_df.columns) > EXCEL_MAX_COLS:
+            raise ValueError(
+                f"This sheet is too large! '{sheet_name}' needs {len(sheet_df) + 1:,} rows and "
+                f"{len(sheet_df.columns):,} columns but Excel allows at most "
+                f"{EXCEL_MAX_ROWS:,} rows and {EXCEL_MAX_COLS:,} columns."
+            )
+    output = BytesIO()
+    workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
+    header_format = workbook.add_format({'bold': True})
+    for sheet_name, sheet_df in sheets.items():
+        worksheet = workbook.add_worksheet(sheet_name)
+        worksheet.write_row(0, 0, [str(col) for col in sheet_df.columns], header_format)
+        # Box values a block at a time so memory stays bounded by the block,
+        # not the sheet; missing values become blank cells
+        for block_start in range(0, len(sheet_df), EXCEL_WRITE_BLOCK_SIZE):
+            block = sheet_df.iloc[block_start:block_start + EXCEL_WRITE_BLOCK_SIZE]
+            values = block.astype(object).where(block.notna(), None)
+            for row_idx, row in enumerate(values.itertuples(index=False, name=None), start=block_start + 1):
+                worksheet.write_row(row_idx, 0, row)
+    workbook.close()
+    # getvalue() hands back the finished buffer without copying it
+    return output.getvalue()
+
+
+# The export helpers below are keyed on cache_key (the file_key plus the key
+# selection); the underscored DataFrame arguments are not hashed.
+@st.cache_data(show_spinner=False, max_entries=CACHE_MAX_ENTRIES)
+def to_excel_bytes(cache_key: tuple, _sheets: dict) -> bytes:
+    """Encode the given sheets as an Excel workbook."""
+    return to_excel(_sheets)
+
+
+def _arrow_csv_matches_pandas(field_type) -> bool:
+    """Whether Arrow writes this column type exactly as DataFrame.to_csv does.
+
+    Integers and strings match; Arrow writes booleans as true/false and 1.0
+    as 1, so those columns go through pandas.
+    """
+    if pa.types.is_dictionary(field_type):
+        field_type = field_type.value_type
+    return pa.types.is_integer(field_type) or pa.types.is_string(field_type) or pa.types.is_large_string(field_type)
+
+
+@st.cache_data(show_spinner=False, max_entries=CACHE_MAX_ENTRIES)
+def to_csv_bytes(cache_key: tuple, _df: pd.DataFrame) -> bytes:
+    """Encode a DataFrame as CSV, using Arrow's C++ writer when its output is identical."""
+    # A one-column row holding an empty value is quoted by pandas but not by Arrow
+    if len(_df.columns) > 1:
+        try:
+            table = pa.Table.from_pandas(_df, preserve_index=False)
+            if all(_arrow_csv_matches_pandas(field.type) for field in table.schema):
+                # Arrow always quotes header names, so write the header the way pandas does
+                header = StringIO()
+                csv.writer(header, lineterminator='\n').writerow(_df.columns)
+                sink = pa.BufferOutputStream()
+                # With quoting_style='none', values that would need quoting raise ArrowInvalid
+                pacsv.write_csv(table, sink, pacsv.WriteOptions(include_header=False, quoting_style='none'))
+                return header.getvalue().encode() + sink.getvalue().to_pybytes()
+        except pa.ArrowException:
+            # Columns mixing types (e.g. int and str) have no Arrow type, and
+            # values containing delimiters, quotes or newlines need quoting
+            pass
+    output = BytesIO()
+    _df.to_csv(output, index=False, chunksize=50_000, lineterminator='\n')
+    return output.getvalue()
+
 
 st.set_page_config(page_title="JSON Data Extractor", page_icon="📊", layout="wide")
 
@@ -19,43 +287,59 @@ uploaded_file = st.file_uploader("Upload your JSON file", type=["json", "txt"],
 
 if uploaded_file is not None:
     try:
-        # Load the JSON data
-        json_data = json.load(uploaded_file)
-        
-        if show_raw_json:
-            with st.expander("Raw JSON Structure"):
-                st.json(json_data)
+        # Read the upload as bytes (getvalue() avoids depending on the buffer
+        # position); the cached helpers are keyed on the upload's identity,
+        # which changes with every new upload, so the bytes are never hashed
+        file_bytes = uploaded_file.getvalue()
+        file_key = f"{uploaded_file.file_id}:{uploaded_file.size}"
+        streamed = len(file_bytes) > STREAM_THRESHOLD
+        # A root array is used as the data source directly (see get_records)
+        start = json_start(file_bytes)
+        root_is_array = file_bytes[start:start + 1] == b'['
         
-        # Extract the 'data' list
-        data_list = json_data.get("data", [])
+        if streamed:
+            # Large file: only sample the first records for key discovery
+            json_data = None
+            if show_raw_json:
+                with st.expander("Raw JSON Structure"):
+                    st.caption("File is too large to render in full; showing the first 1 KB.")
+                    st.code(file_bytes[:1024].decode(errors='replace'), language='json')
+            data_list = peek_records(file_key, file_bytes)
+        else:
+            # Load the JSON data
+            json_data = load_json(file_key, file_bytes)
+            
+            if show_raw_json:
+                with st.expander("Raw JSON Structure"):
+                    st.json(json_data)
+            
+            # Extract the 'data' list (or the root array)
+            data_list = get_records(file_key, file_bytes)
         
         if not data_list:
-            st.error("No 'data' key found or it is empty in the JSON.")
-            # Alternative: check if the root is already a list
-            if isinstance(json_data, list):
-                data_list = json_data
-                st.info("Using root array as data source.")
+            if root_is_array:
+                st.error("The root array in the JSON is empty.")
             else:
+                st.error("No 'data' key found or it is empty in the JSON.")
+            if isinstance(json_data, dict):
                 # Show available keys to help user
                 available_keys = list(json_data.keys())
                 st.info(f"Available keys in JSON: {', '.join(available_keys)}")
         else:
+            if root_is_array:
+                st.info("Using root array as data source.")
+            
             # Collect all unique keys from the data items with data types
-            keys_info = {}
-            for item in data_list:
-                if isinstance(item, dict):
-                    for key, value in item.items():
-                        if key not in keys_info:
-                            keys_info[key] = set()
-                        keys_info[key].add(type(value).__name__)
+            keys_list, key_labels = key_options(file_key, file_bytes)
             
-            if not keys_info:
+            if not keys_list:
                 st.error("No dictionary items found in the 'data' array.")
             else:
                 # Display keys with their data types
                 st.subheader("Available Keys")
+                if streamed or len(data_list) > KEY_SAMPLE_SIZE:
+                    st.caption(f"Keys and types sampled from the first {KEY_SAMPLE_SIZE:,} records.")
                 
-                keys_list = sorted(list(keys_info.keys()))
                 default_keys = keys_list if auto_select_all else []
                 
                 # Multi-select for keys with type information
@@ -63,25 +347,14 @@ if uploaded_file is not None:
                     "Select keys to retrieve",
                     options=keys_list,
                     default=default_keys,
-                    format_func=lambda x: f"{x} ({', '.join(keys_info[x])})"
+                    format_func=key_labels.__getitem__
                 )
                 
                 if selected_keys:
-                    # Prepare data for DataFrame
-                    df_data = []
-                    for item in data_list:
-                        if isinstance(item, dict):
-                            row = {}
-                            for key in selected_keys:
-                                value = item.get(key, None)
-                                # Handle nested dictionaries or lists
-                                if isinstance(value, (dict, list)):
-                                    value = json.dumps(value)
-                                row[key] = value
-                            df_data.append(row)
+                    # Prepare data for DataFrame (cached per file and key selection)
+                    df = build_df(file_key, file_bytes, tuple(selected_keys))
                     
-                    if df_data:
-                        df = pd.DataFrame(df_data, columns=selected_keys)
+                    if len(df):
                         
                         # Display statistics
                         st.subheader("Data Overview")
@@ -100,20 +373,16 @@ if uploaded_file is not None:
                         # Data summary
                         with st.expander("Data Summary"):
                             st.write("Column Overview:")
-                            summary_data = []
-                            for col in df.columns:
-                                non_null = df[col].count()
-                                null_count = len(df) - non_null
-                                dtype = str(df[col].dtype)
-                                unique_count = df[col].nunique()
-                                summary_data.append({
-                                    'Column': col,
-                                    'Non-Null': non_null,
-                                    'Null': null_count,
-                                    'Data Type': dtype,
-                                    'Unique Values': unique_count
-                                })
-                            st.dataframe(pd.DataFrame(summary_data))
+                            unique_counts, unique_estimated = count_unique(df)
+                            summary_df = pd.DataFrame({'Non-Null': df.count(), 'Unique Values': unique_counts})
+                            summary_df['Null'] = len(df) - summary_df['Non-Null']
+                            summary_df['Data Type'] = df.dtypes.astype(str)
+                            summary_df = summary_df.rename_axis('Column').reset_index()[
+                                ['Column', 'Non-Null', 'Null', 'Data Type', 'Unique Values']
+                            ]
+                            st.dataframe(summary_df)
+                            if unique_estimated:
+                                st.caption(f"Unique counts of text columns are estimated from a {NUNIQUE_SAMPLE_SIZE:,}-row sample.")
                         
                         # Download section
                         st.subheader("Download Options")
@@ -125,28 +394,26 @@ if uploaded_file is not None:
                             timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
                             excel_filename = f"extracted_data_{timestamp}.xlsx"
                             
-                            output_excel = BytesIO()
-                            with pd.ExcelWriter(output_excel, engine='xlsxwriter') as writer:
-                                df.to_excel(writer, index=False, sheet_name='Data')
-                                # Add summary sheet
-                                summary_df = pd.DataFrame(summary_data)
-                                summary_df.to_excel(writer, index=False, sheet_name='Summary')
-                            output_excel.seek(0)
-                            
-                            st.download_button(
-                                label="📥 Download as Excel",
-                                data=output_excel,
-                                file_name=excel_filename,
-                                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                                help="Download data as Excel file with data and summary sheets"
-                            )
+                            # Only build the workbook on request, not on every rerun
+                            if st.button("📄 Prepare Excel file", help="Build the Excel file for download"):
+                                # Data sheet first, then the summary sheet
+                                output_excel = to_excel_bytes(('data', file_key, tuple(selected_keys)), {
+                                    'Data': df,
+                                    'Summary': summary_df,
+                                })
+                                
+                                st.download_button(
+                                    label="📥 Download as Excel",
+                                    data=output_excel,
+                                    file_name=excel_filename,
+                                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                                    help="Download data as Excel file with data and summary sheets"
+                                )
                         
                         with col2:
                             # CSV download
                             csv_filename = f"extracted_data_{timestamp}.csv"
-                            output_csv = BytesIO()
-                            df.to_csv(output_csv, index=False)
-                            output_csv.seek(0)
+                            output_csv = to_csv_bytes(('data', file_key, tuple(selected_keys)), df)
                             
                             st.download_button(
                                 label="📥 Download as CSV",
@@ -171,19 +438,19 @@ if uploaded_file is not None:
                     )
                     
                     if duplicate_check_keys:
-                        # Create a combined key for duplicate checking
-                        if len(duplicate_check_keys) == 1:
-                            df['_combined_key'] = df[duplicate_check_keys[0]].astype(str)
-                        else:
-                            df['_combined_key'] = df[duplicate_check_keys].astype(str).agg(' - '.join, axis=1)
-                        
-                        # Find duplicates
+                        # Find duplicates (categorical key columns are already compared by code)
                         duplicate_mask = df.duplicated(subset=duplicate_check_keys, keep=False)
                         duplicate_records = df[duplicate_mask]
-                        unique_duplicate_keys = duplicate_records['_combined_key'].unique()
                         
                         if len(duplicate_records) > 0:
-                            st.warning(f"Found {len(duplicate_records)} duplicate records based on {len(unique_duplicate_keys)} unique duplicate combinations")
+                            # One row per duplicate combination with its record count
+                            duplicate_summary = (
+                                duplicate_records.groupby(duplicate_check_keys, sort=False, dropna=False, observed=True)
+                                .size()
+                                .reset_index(name='Count')
+                                .sort_values('Count', ascending=False)
+                            )
+                            st.warning(f"Found {len(duplicate_records)} duplicate records based on {len(duplicate_summary)} unique duplicate combinations")
                             
                             # Create tabs for different views
                             tab1, tab2, tab3 = st.tabs([
@@ -194,10 +461,7 @@ if uploaded_file is not None:
                             
                             with tab1:
                                 st.write("**Duplicate Combinations Summary:**")
-                                summary_df = duplicate_records.groupby('_combined_key').size().reset_index()
-                                summary_df.columns = ['Combined Key', 'Count']
-                                summary_df = summary_df.sort_values('Count', ascending=False)
-                                st.dataframe(summary_df, use_container_width=True)
+                                st.dataframe(duplicate_summary, use_container_width=True)
                                 
                                 # Show one example per duplicate group
                                 st.write("**Sample from each duplicate group:**")
@@ -206,41 +470,40 @@ if uploaded_file is not None:
                             
                             with tab2:
                                 st.write("**All duplicate entries:**")
-                                # Sort by the combined key for better organization
-                                duplicate_records_sorted = duplicate_records.sort_values('_combined_key')
+                                # Sort by the duplicate keys for better organization (as strings,
+                                # since JSON columns may mix types)
+                                duplicate_records_sorted = duplicate_records.sort_values(
+                                    duplicate_check_keys, key=lambda col: col.astype(str)
+                                )
                                 st.dataframe(duplicate_records_sorted[selected_keys], use_container_width=True)
                                 
                                 st.write(f"**Total duplicate records:** {len(duplicate_records)}")
-                                st.write(f"**Unique duplicate combinations:** {len(unique_duplicate_keys)}")
+                                st.write(f"**Unique duplicate combinations:** {len(duplicate_summary)}")
                             
                             with tab3:
                                 # Download duplicate records
                                 st.write("Download the duplicate records:")
                                 
-                                duplicate_excel = BytesIO()
-                                with pd.ExcelWriter(duplicate_excel, engine='xlsxwriter') as writer:
-                                    duplicate_records[selected_keys].to_excel(writer, index=False, sheet_name='Duplicate_Records')
-                                    
-                                    # Add summary sheet
-                                    summary_df = duplicate_records.groupby('_combined_key').size().reset_index()
-                                    summary_df.columns = ['Combined_Key', 'Duplicate_Count']
-                                    summary_df = summary_df.sort_values('Duplicate_Count', ascending=False)
-                                    summary_df.to_excel(writer, index=False, sheet_name='Duplicate_Summary')
-                                
-                                duplicate_excel.seek(0)
+                                duplicate_cache_key = ('duplicates', file_key, tuple(selected_keys), tuple(duplicate_check_keys))
                                 
-                                st.download_button(
-                                    label="📥 Download Duplicate Report",
-                                    data=duplicate_excel,
-                                    file_name=f"duplicate_report_{timestamp}.xlsx",
-                                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                                    help="Download Excel file with duplicate records and summary"
-                                )
+                                # Only build the workbook on request, not on every rerun
+                                if st.button("📄 Prepare Duplicate Report", help="Build the duplicate report for download"):
+                                    duplicate_excel = to_excel_bytes(duplicate_cache_key, {
+                                        'Duplicate_Records': duplicate_records[selected_keys],
+                                        # Add summary sheet
+                                        'Duplicate_Summary': duplicate_summary.rename(columns={'Count': 'Duplicate_Count'}),
+                                    })
+                                    
+                                    st.download_button(
+                                        label="📥 Download Duplicate Report",
+                                        data=duplicate_excel,
+                                        file_name=f"duplicate_report_{timestamp}.xlsx",
+                                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                                        help="Download Excel file with duplicate records and summary"
+                                    )
                                 
                                 # Also offer CSV download for duplicates
-                                duplicate_csv = BytesIO()
-                                duplicate_records[selected_keys].to_csv(duplicate_csv, index=False)
-                                duplicate_csv.seek(0)
+                                duplicate_csv = to_csv_bytes(duplicate_cache_key, duplicate_records[selected_keys])
                                 
                                 st.download_button(
                                     label="📥 Download Duplicates as CSV",
@@ -250,10 +513,7 @@ if uploaded_file is not None:
                                 )
                         else:
                             st.success("✅ No duplicates found based on the selected keys!")
-                        
-                        # Clean up temporary column
-                        df.drop('_combined_key', axis=1, inplace=True, errors='ignore')
-    except json.JSONDecodeError:
+    except (json.JSONDecodeError, orjson.JSONDecodeError, ijson.JSONError):
         # Enhanced error message for TXT files
         if uploaded_file.name.endswith('.txt'):
             st.error("""